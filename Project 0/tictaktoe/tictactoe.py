@@ -3,12 +3,31 @@ Tic Tac Toe Player
 """
 
 import math
-import copy
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# bitboards: bit (3*i + j) is set if cell (i, j) is taken by the player
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100                # diagonals
+)
+FULL_BOARD = 0b111111111
+# returned by outcome while the game is still going on
+NOT_OVER = 2
+
+# cells tried first give the most alpha-beta cutoffs: center, corners, then edges
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+# MOVE_ORDER with a known best cell moved to the front, indexed by that cell
+BEST_FIRST_ORDER = tuple((c,) + tuple(m for m in MOVE_ORDER if m != c) for c in range(9))
+
+# transposition table shared by every search: key -> (utility + 1) | flag << 2 | cell << 4
+# the flag tells if the stored utility is exact or only a bound on it
+EXACT, LOWER, UPPER = 0, 1, 2
+TT = {}
+
 
 def initial_state():
     """
@@ -23,16 +42,10 @@ def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    countX = 0
-    countO = 0
-    for row in board:
-        for block in row:
-            if (block == X):
-                countX += 1
-            elif (block == O):
-                countO += 1
-    
-    if countX <= countO:
+    # X moves first, so X is next whenever an odd number of cells is empty
+    # list.count scans each row in C instead of a Python loop over every cell
+    countEmpty = sum(row.count(EMPTY) for row in board)
+    if countEmpty % 2 == 1:
         return X
     else:
         return O
@@ -61,38 +74,60 @@ def result(board, action):
     if board[action[0]][action[1]] != EMPTY:
         raise ValueError("Invalid action: Cell is already occupied.")
 
-    newBoard = copy.deepcopy(board)
+    # cells are immutable, copying the rows is enough
+    newBoard = [row[:] for row in board]
     actor = player(board)
     newBoard[action[0]][action[1]] = actor
     return newBoard
 
-# helper function that checks if the actor won the game
-def winnerHelper(board, actor):
-    # horizontal check
+# helper function that converts the board into (xbits, obits) bitboards in a single scan
+def toBits(board):
+    xbits = 0
+    obits = 0
     for i in range(3):
-        if (board[i][0]==actor and board[i][1]==actor and board[i][2]==actor):
-            return True
-    
-    # vertical check
-    for j in range(3):
-        if(board[0][j]==actor and board[1][j]==actor and board[2][j]==actor):
+        for j in range(3):
+            if board[i][j] == X:
+                xbits |= 1 << (3*i + j)
+            elif board[i][j] == O:
+                obits |= 1 << (3*i + j)
+    return (xbits, obits)
+
+# helper function that checks if the bitboard contains a winning line
+def winnerHelper(bits):
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
             return True
-        
-    # diagonal check
-    if (board[0][0]==actor and board[1][1]==actor and board[2][2]==actor):
-        return True
-    if (board[2][0]==actor and board[1][1]==actor and board[0][2]==actor):
-        return True
-    
     return False
 
+# helper function that checks the bitboards for the end of the game in a single pass
+# returns the utility if the game is over, NOT_OVER otherwise
+def outcome(xbits, obits):
+    for mask in WIN_MASKS:
+        if xbits & mask == mask:
+            return 1
+        if obits & mask == mask:
+            return -1
+    if (xbits | obits) == FULL_BOARD:
+        return 0
+    return NOT_OVER
+
+# helper function that evaluates the bitboards
+# returns (is_terminal, utility, next_player), next_player is None once the game is over
+def evaluate(xbits, obits):
+    value = outcome(xbits, obits)
+    if value != NOT_OVER:
+        return (True, value, None)
+    # X moves first, so X is next whenever an even number of cells is taken
+    return (False, 0, X if bin(xbits | obits).count("1") % 2 == 0 else O)
+
 def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    if(winnerHelper(board, X)):
+    xbits, obits = toBits(board)
+    if(winnerHelper(xbits)):
         return X
-    if(winnerHelper(board, O)):
+    if(winnerHelper(obits)):
         return O
     return None
 
@@ -101,79 +136,86 @@ def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    # did X or O win?
-    win = winner(board)
-    if(win != None):
-        return True
-    
-    # is the board full?
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                return False
-            
-    # default True since no empty space found
-    return True
+    return evaluate(*toBits(board))[0]
 
 
 def utility(board):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    win = winner(board)
-    if(win == X):
-        return 1
-    elif win == O:
-        return -1
-    return 0
+    return evaluate(*toBits(board))[1]
 
-# dfs is a recursive helper function for minimax implementing dfs
+# dfs is a recursive helper function for minimax implementing dfs on bitboards
 # minmax : 0 -> min (player O), 1 -> max (player X)
-def dfs(board, minmax, alpha, beta):
-    if terminal(board):
-        return (utility(board), 0, 0)
-    
-    curPlayer = O if minmax==0 else X   #current player taking action
-    finalVal = (100, 0, 0) if minmax==0 else (-100, 0, 0)  #stores final returning (utility, moveX, moveY)
-    moves = actions(board)
-    for move in moves:
-        temp = board[move[0]][move[1]]
-        board[move[0]][move[1]] = curPlayer
+# the turn is passed down through minmax, so player() is never needed inside the search
+# returns (utility, cell) where cell = 3*i + j is the best move
+# table is the transposition table
+def dfs(xbits, obits, minmax, alpha, beta, table):
+    value = outcome(xbits, obits)
+    if value != NOT_OVER:
+        return (value, 0)
+    occupied = xbits | obits
+
+    # same position may be reached by different move orders, reuse its result
+    key = xbits | (obits << 9)
+    entry = table.get(key, -1)
+    moves = MOVE_ORDER
+    if entry != -1:
+        value = (entry & 3) - 1
+        flag = (entry >> 2) & 3
+        cell = entry >> 4
+        if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+            return (value, cell)
+        # a best move stored by an earlier search is likely to cut off again
+        moves = BEST_FIRST_ORDER[cell]
+    alphaOrig, betaOrig = alpha, beta
+
+    finalVal = (100, 0) if minmax==0 else (-100, 0)  #stores final returning (utility, cell)
+    for cell in moves:
+        move = 1 << cell
+        if occupied & move:
+            continue
 
         # currently turn is of minimizing player O
         if(minmax == 0):
-            val = dfs(board, 1, alpha, beta)
+            val = dfs(xbits, obits | move, 1, alpha, beta, table)
             beta = min(beta, val[0])
             if (val[0] < finalVal[0]):
-                finalVal = (val[0], move[0], move[1])
+                finalVal = (val[0], cell)
             # found a smaller value which will be selected by current min fn and not be selected by the parent max fn?
-            if(finalVal[0] <= alpha): 
-                board[move[0]][move[1]] = temp
+            if(finalVal[0] <= alpha):
                 break
 
-        # current player is maximizing player X 
+        # current player is maximizing player X
         else:
-            val = dfs(board, 0, alpha, beta)
+            val = dfs(xbits | move, obits, 0, alpha, beta, table)
             alpha = max(alpha, val[0])
             if(val[0] > finalVal[0]):
-                finalVal = (val[0], move[0], move[1])
+                finalVal = (val[0], cell)
             # found a bigger value which will be selected by current max fn and not be selected by the parent min?
             if(finalVal[0] >= beta):
-                board[move[0]][move[1]] = temp
                 break
-        board[move[0]][move[1]] = temp
 
+    # a value outside the original window was cut off, so it is only a bound
+    if finalVal[0] <= alphaOrig:
+        flag = UPPER
+    elif finalVal[0] >= betaOrig:
+        flag = LOWER
+    else:
+        flag = EXACT
+    table[key] = (finalVal[0] + 1) | (flag << 2) | (finalVal[1] << 4)
     return finalVal
 
 def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if terminal(board):
+    xbits, obits = toBits(board)
+    isTerminal, _, currPlayer = evaluate(xbits, obits)
+    if isTerminal:
         return None
-    currPlayer = player(board)
     if(currPlayer == X):
-        rec = dfs(board, 1, -100, +100)
+        rec = dfs(xbits, obits, 1, -100, +100, TT)
     else:
-        rec = dfs(board, 0, -100, 100)
-    return (rec[1],rec[2])
+        rec = dfs(xbits, obits, 0, -100, 100, TT)
+    return divmod(rec[1], 3)
@@ -1,6 +1,11 @@
 import itertools
 import random
 
+import numpy as np
+from pysat.card import CardEnc, EncType
+from pysat.formula import IDPool
+from pysat.solvers import Glucose3
+
 
 class Minesweeper():
     """
@@ -15,20 +20,25 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = np.zeros((height, width), dtype=np.bool_)
 
         # Add mines randomly
         while len(self.mines) != mines:
             i = random.randrange(height)
             j = random.randrange(width)
-            if not self.board[i][j]:
+            if not self.board[i, j]:
                 self.mines.add((i, j))
-                self.board[i][j] = True
+                self.board[i, j] = True
+
+        # Count the mines around every cell once, as the sum of the
+        # board shifted one step in each of the 8 directions
+        padded = np.pad(self.board, 1).astype(np.int8)
+        self.mine_counts = sum(
+            padded[1 + di:1 + di + height, 1 + dj:1 + dj + width]
+            for di in (-1, 0, 1)
+            for dj in (-1, 0, 1)
+            if (di, dj) != (0, 0)
+        )
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -41,7 +51,7 @@ class Minesweeper():
         for i in range(self.height):
             print("--" * self.width + "-")
             for j in range(self.width):
-                if self.board[i][j]:
+                if self.board[i, j]:
                     print("|X", end="")
                 else:
                     print("| ", end="")
@@ -49,8 +59,7 @@ class Minesweeper():
         print("--" * self.width + "-")
 
     def is_mine(self, cell):
-        i, j = cell
-        return self.board[i][j]
+        return bool(self.board[cell])
 
     def nearby_mines(self, cell):
         """
@@ -58,24 +67,7 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        return int(self.mine_counts[cell])
 
     def won(self):
         """
@@ -104,20 +96,22 @@ class Sentence():
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
+        The set is not copied, callers must not modify it.
         """
         # mines can only be determined if no. of cells == count of mines, since all cells are mines
         if (len(self.cells) == self.count):
-            return self.cells.copy()
+            return self.cells
         return set()
 
     def known_safes(self):
         """
         Returns the set of all cells in self.cells known to be safe.
+        The set is not copied, callers must not modify it.
         """
         # if no cell can be a mine, all of them are safe
         # if any of the cell can be a mine, we have no certainity
         if (self.count == 0):
-            return self.cells.copy()
+            return self.cells
         return set()
 
     def mark_mine(self, cell):
@@ -158,17 +152,30 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
+        # Cells that are neither clicked on nor known to be mines
+        self.unknown = set((i, j) for i in range(height) for j in range(width))
+
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # Maps each cell to the indices of the sentences in knowledge containing it
+        self.cell_index = {}
+
+        # Set once marking leaves a sentence without cells, so it can be dropped
+        self.emptied = False
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.unknown.discard(cell)
+        # the cell is removed from every sentence, so its index entry goes too
+        for k in self.cell_index.pop(cell, ()):
+            self.knowledge[k].mark_mine(cell)
+            if not self.knowledge[k].cells:
+                self.emptied = True
 
     def mark_safe(self, cell):
         """
@@ -176,8 +183,33 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        for k in self.cell_index.pop(cell, ()):
+            self.knowledge[k].mark_safe(cell)
+            if not self.knowledge[k].cells:
+                self.emptied = True
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and indexes it by its cells.
+        """
+        k = len(self.knowledge)
+        self.knowledge.append(sentence)
+        for cell in sentence.cells:
+            self.cell_index.setdefault(cell, set()).add(k)
+
+    def drop_empty_sentences(self):
+        """
+        Removes sentences left without cells from the knowledge base
+        and reindexes the remaining ones.
+        """
+        if not self.emptied:
+            return
+        sentences = [sentence for sentence in self.knowledge if sentence.cells]
+        self.knowledge = []
+        self.cell_index = {}
+        self.emptied = False
+        for sentence in sentences:
+            self.add_sentence(sentence)
 
     def add_knowledge(self, cell, count):
         """
@@ -191,11 +223,12 @@ class MinesweeperAI():
                based on the value of `cell` and `count`
             4) mark any additional cells as safe or as mines
                if it can be concluded based on the AI's knowledge base
-            5) add any new sentences to the AI's knowledge base
-               if they can be inferred from existing knowledge
+            5) mark every remaining cell whose value follows from the
+               knowledge base as a whole, by testing it with a SAT solver
         """
         # Step 1 - add to moves
         self.moves_made.add(cell)
+        self.unknown.discard(cell)
         # Step 2 - mark it as safe(given) and updates every other knowledge
         self.mark_safe(cell)
 
@@ -216,48 +249,60 @@ class MinesweeperAI():
                         neighbors.add(neighbor)
         # if any new neighbors have been found
         if neighbors:
-            self.knowledge.append(Sentence(neighbors, count))
+            self.add_sentence(Sentence(neighbors, count))
         
         # Step 4 - Checking if any new safes or mines added from sentences
+        # Note - marked cells are removed from every sentence, so the cells
+        # found here are always new and the loop stops once none are found
         updatesDone = True
         while updatesDone:
-            updatesDone = False
-            allSafes = set()
-            allMines = set()
-            
+            # sentences emptied by the last marks carry no information, skip rescanning them
+            self.drop_empty_sentences()
+            newSafes = set()
+            newMines = set()
+
             # finding all safe and known mine cells from all knowledge sentences
             for sentence in self.knowledge:
-                allSafes = allSafes.union(sentence.known_safes())
-                allMines = allMines.union(sentence.known_mines())
-
-            # check if new safe cells have been found
-            for safe_cell in allSafes:
-                if safe_cell not in self.safes:
-                    self.mark_safe(safe_cell)
-                    updatesDone = True
-
-            # check if new mines have been found
-            for mine_cell in allMines:
-                if mine_cell not in self.mines:
-                    self.mark_mine(mine_cell)
-                    updatesDone = True
-        
-        # Step 5 - infer new sentences using subsets 
-        inferences = []
-        for s1 in self.knowledge:
-            for s2 in self.knowledge:
-                if s1 == s2:
-                    continue
-                # remove the subset from the superset to find new inferences
-                if s1.cells.issubset(s2.cells):
-                    newCells = s2.cells - s1.cells
-                    diffCount = s2.count - s1.count
-                    inference = Sentence(newCells, diffCount)
-                    # if inference is not already known
-                    if inference not in inferences and inference not in self.knowledge:
-                        inferences.append(inference)
-        
-        self.knowledge.extend(inferences)
+                newSafes |= sentence.known_safes()
+                newMines |= sentence.known_mines()
+
+            for safe_cell in newSafes:
+                self.mark_safe(safe_cell)
+            for mine_cell in newMines:
+                self.mark_mine(mine_cell)
+            updatesDone = bool(newSafes or newMines)
+
+        # Step 5 - find every remaining cell whose value follows from the knowledge
+        # Note - each sentence becomes a CNF cardinality constraint "exactly count
+        # of cells are mines"; a cell is a mine if the CNF is unsatisfiable with
+        # the cell safe, and safe if it is unsatisfiable with the cell a mine
+        pool = IDPool()
+        clauses = []
+        for sentence in self.knowledge:
+            if sentence.cells:
+                lits = [pool.id(c) for c in sentence.cells]
+                clauses.extend(CardEnc.equals(
+                    lits=lits, bound=sentence.count, vpool=pool, encoding=EncType.seqcounter
+                ).clauses)
+
+        newSafes = []
+        newMines = []
+        with Glucose3(bootstrap_with=clauses) as solver:
+            if solver.solve():
+                # a cell only needs testing against the opposite of its value in one model
+                model = set(lit for lit in solver.get_model() if lit > 0)
+                for frontier_cell in self.cell_index:
+                    x = pool.id(frontier_cell)
+                    if x in model:
+                        if not solver.solve(assumptions=[-x]):
+                            newMines.append(frontier_cell)
+                    elif not solver.solve(assumptions=[x]):
+                        newSafes.append(frontier_cell)
+
+        for safe_cell in newSafes:
+            self.mark_safe(safe_cell)
+        for mine_cell in newMines:
+            self.mark_mine(mine_cell)
 
     def make_safe_move(self):
         """
@@ -281,14 +326,6 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        validMoves = set()
-        for i in range(self.height):
-            for j in range(self.width):
-                validMoves.add((i,j))
-        
-        validMoves = validMoves - self.mines - self.moves_made
-
-        if validMoves:
-            return random.choice(list(validMoves))
+        if self.unknown:
+            return random.choice(tuple(self.unknown))
         return None
-
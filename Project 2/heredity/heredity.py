@@ -1,7 +1,10 @@
 import csv
+import heapq
 import itertools
 import sys
 
+import numpy as np
+
 PROBS = {
 
     # Unconditional probabilities for having gene
@@ -36,6 +39,9 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Most people eliminate_probabilities joins into one cluster, its tables have 3^size entries
+MAX_CLUSTER = 14
+
 """ people dict sample structure
 people = {
     "Harry": {
@@ -66,46 +72,38 @@ def main():
         sys.exit("Usage: python heredity.py data.csv")
     people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
+    # Keep track of gene and trait probabilities for each person as arrays,
+    # row i is people[names[i]], columns are gene counts 0, 1, 2 and trait True, False
+    names = list(people)
+
+    # Enumerating assignments grows as 3^n, so large families use
+    # variable elimination on the Bayesian network instead
+    if len(names) > 10:
+        gene_probs = eliminate_probabilities(people)
+    else:
+        gene_probs = enumerate_probabilities(people)
+    trait_probs = trait_totals(people, gene_probs)
+
+    # Ensure probabilities sum to 1
+    gene_probs /= gene_probs.sum(axis=1, keepdims=True)
+    trait_probs /= trait_probs.sum(axis=1, keepdims=True)
+
+    # Gene and trait distributions of each person, as printed below
     probabilities = {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: float(gene_probs[i, 2]),
+                1: float(gene_probs[i, 1]),
+                0: float(gene_probs[i, 0])
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: float(trait_probs[i, 0]),
+                False: float(trait_probs[i, 1])
             }
         }
-        for person in people
+        for (i, person) in enumerate(names)
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
-
-    # Ensure probabilities sum to 1
-    normalize(probabilities)
-
     # Print results
     for person in people:
         print(f"{person}:")
@@ -140,14 +138,12 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Return an iterator over all possible subsets of set s, as frozensets.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    return map(frozenset, itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ))
 
 # helper fn for joint_probability 
 # finds probabilty of inheritance of gene
@@ -234,6 +230,209 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     
 
 
+def enumerate_probabilities(people):
+    """
+    Return an array whose row i holds, for each gene count of the i-th
+    person in `people`, the total joint probability of the gene assignments
+    with that count and the known traits. All 3^n gene assignments are
+    computed at once with NumPy arrays.
+    Unknown traits are summed out per gene assignment instead of being
+    enumerated, which gives the same totals as looping over `have_trait`.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+
+    # genes[i] is person i's gene count in every one of the 3^n assignments
+    genes = np.indices((3,) * len(names)).reshape(len(names), -1)
+
+    # per gene count lookup tables
+    unconditional = np.array([PROBS["gene"][g] for g in range(3)])
+    passing = np.array([gene_pass_prob(g) for g in range(3)])
+    given_gene = {
+        trait: np.array([PROBS["trait"][g][trait] for g in range(3)])
+        for trait in (True, False)
+    }
+
+    # joint probability of each gene assignment and the known traits
+    p = np.ones(genes.shape[1])
+    for i, person in enumerate(names):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother and father:
+            mother_inheritance = passing[genes[index[mother]]]
+            father_inheritance = passing[genes[index[father]]]
+            p *= np.choose(genes[i], [
+                (1 - mother_inheritance) * (1 - father_inheritance),
+                mother_inheritance * (1 - father_inheritance) + father_inheritance * (1 - mother_inheritance),
+                mother_inheritance * father_inheritance
+            ])
+        else:
+            p *= unconditional[genes[i]]
+
+        trait = people[person]["trait"]
+        if trait is not None:
+            p *= given_gene[trait][genes[i]]
+
+    # accumulate every (person, gene count) pair with a single bincount
+    n = len(names)
+    cells = genes + 3 * np.arange(n)[:, None]
+    return np.bincount(cells.ravel(), weights=np.tile(p, n), minlength=3 * n).reshape(n, 3)
+
+
+# helper fn for eliminate_probabilities
+# multiplies the factors and sums out every person not in keep
+# a factor is (people indices, table with one axis of 3 gene counts per person)
+def sum_product(factors, keep):
+    keep = tuple(sorted(keep))
+    # people kept but in no factor get a flat factor, nothing is known about them here
+    present = set().union(*(f[0] for f in factors))
+    factors = factors + [((v,), np.ones(3)) for v in keep if v not in present]
+
+    variables = sorted(present.union(keep))
+
+    # einsum only accepts small labels, so relabel the people involved
+    labels = {v: k for k, v in enumerate(variables)}
+    operands = []
+    for (f_vars, table) in factors:
+        operands += [table, [labels[v] for v in f_vars]]
+    table = np.einsum(*operands, [labels[v] for v in keep])
+
+    # only proportions are needed, rescaling keeps long products of
+    # small probabilities from underflowing to 0
+    return (keep, table / table.sum())
+
+
+def eliminate_probabilities(people):
+    """
+    Return an array whose row i is proportional to the gene totals that
+    `enumerate_probabilities` returns for the i-th person in `people`,
+    computed by message passing over the family's Bayesian network.
+    Eliminating each person once builds a tree of clusters; one pass up and
+    one pass down that tree gives every person's distribution. The cost is
+    linear in the number of clusters but exponential in the size of the
+    largest one: a few people in a family tree, more when related lines
+    intermarry. Exits if a cluster would exceed MAX_CLUSTER people.
+    """
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+
+    unconditional = np.array([PROBS["gene"][g] for g in range(3)])
+    passing = np.array([gene_pass_prob(g) for g in range(3)])
+    given_gene = {
+        trait: np.array([PROBS["trait"][g][trait] for g in range(3)])
+        for trait in (True, False)
+    }
+
+    # inherit[m, f, g] is the probability of g genes given the parents' gene counts
+    inherit = np.empty((3, 3, 3))
+    inherit[:, :, 0] = np.outer(1 - passing, 1 - passing)
+    inherit[:, :, 1] = np.outer(passing, 1 - passing) + np.outer(1 - passing, passing)
+    inherit[:, :, 2] = np.outer(passing, passing)
+
+    # one factor per person for their genes, one more if their trait is known
+    factors = []
+    for i, person in enumerate(names):
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother and father:
+            factors.append(((index[mother], index[father], i), inherit))
+        else:
+            factors.append(((i,), unconditional))
+
+        trait = people[person]["trait"]
+        if trait is not None:
+            factors.append(((i,), given_gene[trait]))
+
+    # elimination order: repeatedly pick the person with the fewest neighbors
+    # in the graph connecting everyone sharing a factor (stale heap entries are skipped)
+    neighbors = {i: set() for i in range(len(names))}
+    for (f_vars, _) in factors:
+        for v in f_vars:
+            neighbors[v].update(f_vars)
+            neighbors[v].discard(v)
+    heap = [(len(neighbors[v]), v) for v in neighbors]
+    heapq.heapify(heap)
+    order = []
+    largest = 0     # eliminating var joins it and its neighbors into one cluster
+    while heap:
+        degree, var = heapq.heappop(heap)
+        if var not in neighbors or degree != len(neighbors[var]):
+            continue
+        largest = max(largest, degree + 1)
+        for v in neighbors[var]:
+            neighbors[v].update(neighbors[var] - {v})
+            neighbors[v].discard(var)
+            heapq.heappush(heap, (len(neighbors[v]), v))
+        del neighbors[var]
+        order.append(var)
+
+    # each cluster is a table with 3^size entries, too many people would exhaust memory
+    if largest > MAX_CLUSTER:
+        sys.exit(f"Family too interrelated: computing it would join {largest} people, "
+                 f"at most {MAX_CLUSTER} are supported.")
+
+    # upward pass: eliminating var joins the pending factors containing it into
+    # var's cluster and sends the sum over var to the cluster that uses it next
+    pending = dict(enumerate((f_vars, table, None) for (f_vars, table) in factors))
+    containing = {i: set() for i in range(len(names))}
+    for (k, (f_vars, _, _)) in pending.items():
+        for v in f_vars:
+            containing[v].add(k)
+    assigned = {}     # original factors placed in var's cluster
+    children = {}     # clusters sending their message up to var's cluster
+    separator = {}    # people var's cluster shares with its parent cluster
+    upward = {}       # message from var's cluster to its parent cluster
+    for var in order:
+        joined = []
+        for k in sorted(containing.pop(var)):
+            joined.append(pending.pop(k))
+            for v in joined[-1][0]:
+                if v != var:
+                    containing[v].discard(k)
+        assigned[var] = [(f_vars, table) for (f_vars, table, source) in joined if source is None]
+        children[var] = [source for (_, _, source) in joined if source is not None]
+        cluster = set().union(*(f_vars for (f_vars, _, _) in joined))
+        separator[var] = tuple(sorted(cluster - {var}))
+        upward[var] = sum_product([(f_vars, table) for (f_vars, table, _) in joined], separator[var])
+
+        k = len(factors) + len(upward)
+        pending[k] = (upward[var][0], upward[var][1], var)
+        for v in separator[var]:
+            containing[v].add(k)
+
+    # downward pass: each cluster passes to a child everything it knows except
+    # what came from that child, parents are eliminated after their children
+    downward = {}
+    gene_totals = np.empty((len(names), 3))
+    for var in reversed(order):
+        incoming = assigned[var] + [upward[c] for c in children[var]]
+        if var in downward:
+            incoming.append(downward[var])
+        for c in children[var]:
+            others = [f for f in incoming if f is not upward[c]]
+            downward[c] = sum_product(others, separator[c])
+        gene_totals[var] = sum_product(incoming, (var,))[1]
+    return gene_totals
+
+
+def trait_totals(people, gene_totals):
+    """
+    Return an array whose row i holds the total joint probability of the
+    i-th person in `people` having and not having the trait, given the
+    gene totals of each person.
+    """
+    # given_gene[g] is the probability of having and not having the trait with g genes
+    given_gene = np.array([[PROBS["trait"][g][True], PROBS["trait"][g][False]] for g in range(3)])
+    totals = gene_totals @ given_gene
+
+    # a known trait has all of the probability
+    for (i, person) in enumerate(people):
+        trait = people[person]["trait"]
+        if trait is not None:
+            totals[i] = [gene_totals[i].sum(), 0] if trait else [0, gene_totals[i].sum()]
+    return totals
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
     """
     Add to `probabilities` a new joint probability `p`.
@@ -265,12 +464,17 @@ def normalize(probabilities):
     is normalized (i.e., sums to 1, with relative proportions the same).
     """
     for person in probabilities:
-        for distribution in probabilities[person]: # gene and trait are distributions
-            # finding total sum
-            total = sum(probabilities[person][distribution].values())
-            # normalizing
-            for (key, value) in probabilities[person][distribution].items():
-                probabilities[person][distribution][key] = value/total
+        # looking up each distribution once and dividing in place
+        gene = probabilities[person]["gene"]
+        total = gene[2] + gene[1] + gene[0]
+        gene[2] /= total
+        gene[1] /= total
+        gene[0] /= total
+
+        trait = probabilities[person]["trait"]
+        total = trait[True] + trait[False]
+        trait[True] /= total
+        trait[False] /= total
                 
 
 
@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from heredity import MAX_CLUSTER, eliminate_probabilities, enumerate_probabilities, load_data
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def normalized(totals):
+    return totals / totals.sum(axis=1, keepdims=True)
+
+
+def test_elimination_matches_enumeration():
+    for filename in sorted(os.listdir(DATA)):
+        people = load_data(os.path.join(DATA, filename))
+        assert np.allclose(
+            normalized(eliminate_probabilities(people)),
+            normalized(enumerate_probabilities(people))
+        )
+
+
+def test_large_family_does_not_underflow():
+    # 100 unrelated trios where everyone has the rare trait, 300 people,
+    # the product of their probabilities is far below the smallest float
+    people = {}
+    for t in range(100):
+        mother, father, child = f"Mother{t}", f"Father{t}", f"Child{t}"
+        people[mother] = {"name": mother, "mother": None, "father": None, "trait": True}
+        people[father] = {"name": father, "mother": None, "father": None, "trait": True}
+        people[child] = {"name": child, "mother": mother, "father": father, "trait": True}
+
+    totals = eliminate_probabilities(people)
+    assert (totals.sum(axis=1) > 0).all()
+
+    # every trio is independent, so each matches a single-trio enumeration
+    for t in (0, 1):
+        trio = {
+            name: people[name]
+            for name in (f"Mother{t}", f"Father{t}", f"Child{t}")
+        }
+        rows = [list(people).index(name) for name in trio]
+        assert np.allclose(normalized(totals[rows]), normalized(enumerate_probabilities(trio)))
+
+
+def test_interrelated_family_exits_instead_of_exhausting_memory():
+    # every pair of founders has a child, so all founders end up in one cluster
+    founders = [f"Founder{i}" for i in range(MAX_CLUSTER + 1)]
+    people = {
+        name: {"name": name, "mother": None, "father": None, "trait": None}
+        for name in founders
+    }
+    for (i, mother) in enumerate(founders):
+        for father in founders[i + 1:]:
+            child = f"{mother}-{father}"
+            people[child] = {"name": child, "mother": mother, "father": father, "trait": None}
+
+    with pytest.raises(SystemExit):
+        eliminate_probabilities(people)
@@ -1,8 +1,13 @@
+import bisect
+import itertools
 import os
 import random
 import re
 import sys
 
+import numpy as np
+from scipy import sparse
+
 DAMPING = 0.85
 SAMPLES = 10000
 
@@ -79,14 +84,12 @@ def transition_model(corpus, page, damping_factor):
 
 
 # helper function for sample_pagerank function
-# decides the next page for the given current page
-def findNextPage(transitions):
-    cumulativeProb = 0
-    r = random.random()
-    for (page, prob) in transitions.items():
-        cumulativeProb += prob
-        if r < cumulativeProb:
-            return page
+# decides the next page from the cumulative transition probabilities of the current page
+def findNextPage(pages, cumulative, r):
+    # first page whose cumulative probability exceeds r, the last page
+    # also covers r beyond a total slightly below 1 from rounding
+    i = bisect.bisect_right(cumulative, r)
+    return pages[min(i, len(pages)-1)]
 
 def sample_pagerank(corpus, damping_factor, n):
     """
@@ -100,14 +103,23 @@ def sample_pagerank(corpus, damping_factor, n):
     # initially stores the count of page visits, later the page rank
     pagerank = {page: 0 for page in corpus.keys()}
 
+    # cumulative transition probabilities of a page over all pages, built on
+    # its first visit since the transition model of a page never changes
+    pages = list(corpus.keys())
+    cdfs = dict()
+
     # select a random initial page
-    current_page = random.choice(list(corpus.keys()))
+    current_page = random.choice(pages)
     pagerank[current_page] += 1
 
-    # loop to find the next n-1 samples 
-    for i in range(n-1):
-        transitions = transition_model(corpus, current_page, damping_factor)
-        next_page = findNextPage(transitions)
+    # loop to find the next n-1 samples
+    # Note - every draw comes from random, so random.seed() reproduces the walk
+    for _ in range(n-1):
+        r = random.random()
+        if current_page not in cdfs:
+            transitions = transition_model(corpus, current_page, damping_factor)
+            cdfs[current_page] = list(itertools.accumulate(transitions[page] for page in pages))
+        next_page = findNextPage(pages, cdfs[current_page], r)
         pagerank[next_page] += 1
         current_page = next_page
     
@@ -126,32 +138,34 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # initializing a dictionary for every page
-    n = len(corpus)
+    # numbering the pages so ranks can be kept in an array
+    pages = list(corpus)
+    n = len(pages)
+    index = {page: i for (i, page) in enumerate(pages)}
+
+    # links[j, i] is the probability of following a link from page i to page j
+    rows, cols, data = [], [], []
+    for (i, page) in enumerate(pages):
+        for link in corpus[page]:
+            rows.append(index[link])
+            cols.append(i)
+            data.append(1/len(corpus[page]))
+    links = sparse.csr_matrix((data, (rows, cols)), shape=(n, n))
+    # pages with no links are treated as linking to every page
+    dangling = np.array([i for (i, page) in enumerate(pages) if len(corpus[page]) == 0], dtype=int)
+    rand_prob = (1-damping_factor) / n
+
     # filling page rank by 1/N
-    pagerank = {key: 1/n for key in corpus.keys()}
+    pagerank = np.full(n, 1/n)
     # loop that tracks if any acceptable change has occurred
     acceptable_change = True
     while(acceptable_change):
-        acceptable_change = False
-        new_rank = pagerank.copy()
-        for page in pagerank:
-            # damp probability
-            damp_prob = 0
-            for i in pagerank.keys():
-                if len(corpus[i]) == 0:
-                    damp_prob += pagerank[i]/n 
-                elif page in corpus[i]:
-                    damp_prob += (pagerank[i]/len(corpus[i])) 
-            damp_prob *= damping_factor
-            # random-jump probability
-            rand_prob = (1-damping_factor) / n
-            new_rank[page] = damp_prob + rand_prob
-            # checking if there a was a change to continue looping
-            if abs(new_rank[page] - pagerank[page]) > 0.001:
-                acceptable_change = True
+        damp_prob = links @ pagerank + pagerank[dangling].sum() / n
+        new_rank = damping_factor * damp_prob + rand_prob
+        # checking if there a was a change to continue looping
+        acceptable_change = np.max(np.abs(new_rank - pagerank)) > 0.001
         pagerank = new_rank
-    return pagerank
+    return {page: float(pagerank[i]) for (i, page) in enumerate(pages)}
 
 if __name__ == "__main__":
     main()